@@ -1,21 +1,29 @@
 #!/usr/bin/env python3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import csv
-import json
+import mmap
 import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 
 from colorama import Fore, Style, init
 
 # --- Config ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 COOKIE_FILE = os.path.join(BASE_DIR, "cookie.txt")
+USER_CACHE_FILE = os.path.join(BASE_DIR, "last_user.txt")
 BATCH_SIZE = 50
-MAX_RETRIES = 3
-RATE_LIMIT_DELAY = 5
+MAX_RETRIES = 5
+MAX_WORKERS = 8
+DETAILS_TTL = 7 * 24 * 3600  # Re-fetch cached names older than this (seconds)
+CSV_COLUMNS = ("id", "name", "displayName", "hasVerifiedBadge")
 
 # Auto-reset colors after printing
 init(autoreset=True)
@@ -67,166 +75,205 @@ def get_headers(cookie: str) -> Dict:
         "Content-Type": "application/json"
     }
 
+def load_cached_uid() -> Optional[int]:
+    """User ID seen on the last run, used to start the friend list early."""
+    try:
+        with open(USER_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def save_cached_uid(user_id: int):
+    try:
+        with open(USER_CACHE_FILE, 'w', encoding='utf-8') as f:
+            f.write(str(user_id))
+    except OSError:
+        pass
+
 def load_local_history(username: str) -> List[Dict]:
     """Load existing JSON data to use as fallback."""
     filename = os.path.join(BASE_DIR, f"{username}_friends.json")
-    if os.path.exists(filename):
+    # mmap can't map an empty file
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
         except:
             pass
     return []
 
-def get_auth_user(cookie: str):
+def create_session(cookie: str) -> requests.Session:
+    """Shared session so all calls reuse pooled connections and one prebuilt header set."""
+    # Exponential backoff with jitter on 429/5xx, honoring Retry-After when the API sends it
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=1,
+        backoff_jitter=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    session = requests.Session()
+    # One pool per Roblox host; kept-alive sockets skip repeat DNS lookups and TLS handshakes
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, pool_block=False, max_retries=retry)
+    session.mount("https://", adapter)
+    session.headers.update(get_headers(cookie))
+    return session
+
+def get_auth_user(session: requests.Session):
     """Validate cookie and get user info."""
     url = "https://users.roblox.com/v1/users/authenticated"
     try:
-        resp = requests.get(url, headers=get_headers(cookie))
+        resp = session.get(url)
         if resp.status_code == 200:
-            data = resp.json()
+            data = orjson.loads(resp.content)
             log(f"User: {Style.BRIGHT}{data['name']}{Style.RESET_ALL} (ID: {data['id']})", Fore.GREEN)
             return data['id'], data['name']
         log(f"Auth failed. Code: {resp.status_code}", Fore.RED, "ERROR")
         return None, None
-    except requests.RequestException as e:
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         log(f"Connection error: {e}", Fore.RED, "ERROR")
         return None, None
 
-def fetch_friend_ids(user_id: int, cookie: str) -> Optional[List[Dict]]:
-    """Get raw friend list (IDs only) using pagination."""
-    log("Fetching friend list...", Fore.BLUE)
+def fetch_friend_ids(session: requests.Session, user_id: int,
+                     cancel: Optional[threading.Event] = None, verbose: bool = True) -> Optional[List[Dict]]:
+    """
+    Get raw friend list (IDs only) using pagination.
+    Stops with None once `cancel` is set; `verbose=False` keeps it silent.
+    """
+    if verbose: log("Fetching friend list...", Fore.BLUE)
     url = f"https://friends.roblox.com/v1/users/{user_id}/friends/find"
     
     all_friends = []
-    cursor = None
+    params = {"limit": 50}
     
+    # Each page needs the previous cursor, so pages stay sequential on one kept-alive connection
     while True:
-        params = {"limit": 50}
-        if cursor:
-            params["cursor"] = cursor
-            
+        if cancel and cancel.is_set():
+            return None
         try:
-            resp = requests.get(url, headers=get_headers(cookie), params=params)
+            resp = session.get(url, params=params)
             
             if resp.status_code == 200:
-                data = resp.json()
+                data = orjson.loads(resp.content)
                 # Handle possible response structures
-                items = data.get('PageItems', []) or data.get('data', [])
-                all_friends.extend(items)
+                all_friends.extend(data.get('PageItems', []) or data.get('data', []))
                 
                 cursor = data.get('NextCursor') 
                 if not cursor:
                     break
-            elif resp.status_code == 429:
-                log("Rate limit (429). Retrying...", Fore.YELLOW, "WARN")
-                time.sleep(RATE_LIMIT_DELAY)
-                continue
+                params["cursor"] = cursor
             else:
-                log(f"Error fetching list: {resp.status_code}", Fore.RED, "ERROR")
-                break
+                # A partial list would show every missing friend as unfriended
+                if verbose: log(f"Error fetching list: {resp.status_code}", Fore.RED, "ERROR")
+                return None
                 
-        except requests.RequestException:
-            log("Network error while fetching friends.", Fore.RED, "ERROR")
-            break
+        except (requests.RequestException, orjson.JSONDecodeError):
+            if verbose: log("Network error while fetching friends.", Fore.RED, "ERROR")
+            return None
             
-    log(f"Found {len(all_friends)} connections.", Fore.BLUE)
+    if verbose: log(f"Found {len(all_friends)} connections.", Fore.BLUE)
     return all_friends
 
-def fetch_user_details(friends: List[Dict], cookie: str, username: str) -> List[Dict]:
+def fetch_batch(session: requests.Session, batch: List[int], index: int) -> List[Dict]:
+    """Fetch details for a single batch of user IDs (retries are handled by the session)."""
+    url = "https://users.roblox.com/v1/users"
+    # Session headers already carry Content-Type: application/json
+    payload = orjson.dumps({"userIds": batch, "excludeBannedUsers": False})
+
+    try:
+        resp = session.post(url, data=payload)
+        if resp.status_code == 200:
+            return orjson.loads(resp.content).get('data', [])
+        log(f"Batch {index} failed. Code: {resp.status_code}", Fore.YELLOW, "WARN")
+    except (requests.RequestException, orjson.JSONDecodeError):
+        log(f"Network error on batch {index}.", Fore.YELLOW, "WARN")
+    return []
+
+def fetch_user_details(session: requests.Session, friends: List[Dict], old_list: List[Dict]) -> Tuple[List[Dict], Dict[int, Dict], int]:
     """
     Get details (Name, DisplayName) in batches.
-    Handles 429 errors and falls back to local JSON if API fails.
+    Names already in local history are reused until DETAILS_TTL expires.
+    Falls back to local JSON if API fails.
+    Returns the merged list, an {id: friend} map of it and the count of missing names.
     """
-    if not friends: return []
-    
-    log("Fetching user details...", Fore.BLUE)
+    if not friends: return [], {}, 0
     
-    local_data = {u['id']: u for u in load_local_history(username)}
-    user_ids = [f['id'] for f in friends]
-    fetched_map = {}
-    
-    url = "https://users.roblox.com/v1/users"
-
-    # Batch process to avoid hitting limits
-    for i in range(0, len(user_ids), BATCH_SIZE):
-        batch = user_ids[i:i + BATCH_SIZE]
-        payload = {"userIds": batch, "excludeBannedUsers": False}
-        
-        for attempt in range(MAX_RETRIES):
-            try:
-                resp = requests.post(url, json=payload, headers=get_headers(cookie))
-                if resp.status_code == 200:
-                    for u in resp.json().get('data', []):
-                        fetched_map[u['id']] = u
-                    break
-                elif resp.status_code == 429:
-                    wait = (attempt + 1) * RATE_LIMIT_DELAY
-                    log(f"Rate limit on batch {i}. Retrying in {wait}s...", Fore.YELLOW, "WARN")
-                    time.sleep(wait)
-                else:
-                    break
-            except requests.RequestException:
-                time.sleep(1)
+    now = int(time.time())
+    local_data = {u['id']: u for u in old_list}
+    # Reuse fresh local entries; only unknown or stale IDs hit the API
+    fetched_map = {
+        uid: u for uid, u in local_data.items()
+        if u.get('name') and now - (u.get('fetchedAt') or 0) < DETAILS_TTL
+    }
+    to_fetch = [f['id'] for f in friends if f['id'] not in fetched_map]
+
+    if to_fetch:
+        log(f"Fetching user details ({len(to_fetch)} of {len(friends)})...", Fore.BLUE)
+
+        # Batches are independent, so run them concurrently over the pooled session
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = [
+                pool.submit(fetch_batch, session, to_fetch[i:i + BATCH_SIZE], i)
+                for i in range(0, len(to_fetch), BATCH_SIZE)
+            ]
+            for future in futures:
+                for u in future.result():
+                    u['fetchedAt'] = now
+                    fetched_map[u['id']] = u
+    else:
+        log("User details cached locally. Skipping fetch.", Fore.BLUE)
 
     # Merge: API Data > Local History > Raw
     final_list = []
+    cur_map = {}
     recovered = 0
+    invalid_count = 0
     
     for f in friends:
         fid = f['id']
-        api_data = fetched_map.get(fid)
-        local_entry = local_data.get(fid)
-
-        if api_data:
-            f.update({
-                'name': api_data.get('name'),
-                'displayName': api_data.get('displayName'),
-                'hasVerifiedBadge': api_data.get('hasVerifiedBadge')
-            })
-        elif local_entry and local_entry.get('name'):
+        src = fetched_map.get(fid)
+        if not src:
             # Fallback to avoid empty names
-            f.update({
-                'name': local_entry.get('name'),
-                'displayName': local_entry.get('displayName'),
-                'hasVerifiedBadge': local_entry.get('hasVerifiedBadge')
-            })
-            recovered += 1
+            src = local_data.get(fid)
+            if src and src.get('name'):
+                recovered += 1
+            else:
+                src = None
+
+        if src:
+            f['name'] = src.get('name')
+            f['displayName'] = src.get('displayName')
+            f['hasVerifiedBadge'] = src.get('hasVerifiedBadge')
+            f['fetchedAt'] = src.get('fetchedAt')
+        if not f.get('name'):
+            invalid_count += 1
         
         final_list.append(f)
+        cur_map[fid] = f
 
     if recovered:
         log(f"Recovered {recovered} names from local history.", Fore.YELLOW, "WARN")
     
-    return final_list
+    return final_list, cur_map, invalid_count
 
-def analyze_changes(current_list: List[Dict], username: str):
+def analyze_changes(cur_map: Dict[int, Dict], old_list: List[Dict], invalid_count: int, username: str):
     """Check for unfriends/new friends vs local history."""
-    json_file = os.path.join(BASE_DIR, f"{username}_friends.json")
     log_file = os.path.join(BASE_DIR, f"{username}_activity_log.txt")
     
     # Sanity check: Don't analyze if data looks corrupt (too many empty names)
-    empty_names = sum(1 for f in current_list if not f.get('name'))
-    if len(current_list) > 0 and (empty_names / len(current_list)) > 0.5:
+    if len(cur_map) > 0 and (invalid_count / len(cur_map)) > 0.5:
         log("Too many missing names. Skipping analysis.", Fore.RED, "SKIP")
         return
 
-    if not os.path.exists(json_file): return
-
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            old_list = json.load(f)
-    except:
-        return
+    if not old_list: return
 
     old_map = {u['id']: u for u in old_list}
-    cur_map = {u['id']: u for u in current_list}
-    
-    old_ids = set(old_map.keys())
-    cur_ids = set(cur_map.keys())
 
-    unfriended = old_ids - cur_ids
-    new_friends = cur_ids - old_ids
+    unfriended = old_map.keys() - cur_map.keys()
+    new_friends = cur_map.keys() - old_map.keys()
     
     if not unfriended and not new_friends:
         log("No changes detected.", Fore.CYAN)
@@ -235,51 +282,82 @@ def analyze_changes(current_list: List[Dict], username: str):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     logs = []
 
-    print(f"\n{Fore.MAGENTA}{Style.BRIGHT}--- ACTIVITY REPORT ---{Style.RESET_ALL}")
+    # Build the report in one buffer instead of a print per friend
+    magenta, red, green, reset = Fore.MAGENTA + Style.BRIGHT, Fore.RED, Fore.GREEN, Style.RESET_ALL
+    lines = [f"\n{magenta}--- ACTIVITY REPORT ---{reset}"]
 
     if unfriended:
-        print(f"{Fore.RED}❌ LOST ({len(unfriended)}):{Style.RESET_ALL}")
+        lines.append(f"{red}❌ LOST ({len(unfriended)}):{reset}")
         for uid in unfriended:
             u = old_map[uid]
-            print(f"   - {u.get('name', 'Unknown')} (@{u.get('displayName', '-')})")
-            logs.append(f"[{timestamp}] ❌ UNFRIENDED: {u.get('name')} (ID: {uid})\n")
+            name = u.get('name', 'Unknown')
+            lines.append(f"   - {name} (@{u.get('displayName', '-')})")
+            logs.append(f"[{timestamp}] ❌ UNFRIENDED: {name} (ID: {uid})\n")
 
     if new_friends:
-        print(f"{Fore.GREEN}✅ NEW ({len(new_friends)}):{Style.RESET_ALL}")
+        lines.append(f"{green}✅ NEW ({len(new_friends)}):{reset}")
         for uid in new_friends:
             u = cur_map[uid]
-            print(f"   + {u.get('name', 'Unknown')} (@{u.get('displayName', '-')})")
-            logs.append(f"[{timestamp}] ✅ NEW FRIEND: {u.get('name')} (ID: {uid})\n")
+            name = u.get('name', 'Unknown')
+            lines.append(f"   + {name} (@{u.get('displayName', '-')})")
+            logs.append(f"[{timestamp}] ✅ NEW FRIEND: {name} (ID: {uid})\n")
     
-    print(f"{Fore.MAGENTA}{Style.BRIGHT}-----------------------{Style.RESET_ALL}\n")
+    lines.append(f"{magenta}-----------------------{reset}\n")
+    sys.stdout.write("\n".join(lines) + "\n")
 
     try:
         with open(log_file, "a", encoding='utf-8') as f:
-            f.writelines(logs)
+            f.write("".join(logs))
         log("Activity log updated.", Fore.GREEN)
     except Exception as e:
         log(f"Log write failed: {e}", Fore.RED, "ERROR")
 
-def save_database(friends: List[Dict], username: str):
+def write_atomic(path: str, write: Callable, mode: str = 'w', **kwargs):
+    """Write via a temp file and swap it into place so a crash never leaves a half-written file."""
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        # Don't leave a stray temp file behind on a failed save
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def save_database(friends: List[Dict], old_list: List[Dict], invalid_count: int, username: str):
     if not friends: return
 
     # Guard: Don't save if data is mostly garbage
-    invalid_count = sum(1 for f in friends if not f.get('name'))
     if len(friends) > 0 and (invalid_count / len(friends)) > 0.2:
         log("Data corruption detected (names missing). Aborting save.", Fore.RED, "PROTECTION")
         return
 
+    json_path = os.path.join(BASE_DIR, f"{username}_friends.json")
+    csv_path = os.path.join(BASE_DIR, f"{username}_friends.csv")
+
+    # Skip rewriting both files when nothing changed since the last run
+    if friends == old_list and os.path.exists(json_path) and os.path.exists(csv_path):
+        log("Database unchanged.", Fore.CYAN)
+        return
+
     try:
-        with open(os.path.join(BASE_DIR, f"{username}_friends.json"), 'w', encoding='utf-8') as f:
-            json.dump(friends, f, indent=4)
+        payload = orjson.dumps(friends)
+        write_atomic(json_path, lambda f: f.write(payload), 'wb')
     except IOError:
         log("Failed to save JSON.", Fore.RED, "ERROR")
 
+    def write_csv(f):
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(tuple(u.get(c, "") for c in CSV_COLUMNS) for u in friends)
+
     try:
-        with open(os.path.join(BASE_DIR, f"{username}_friends.csv"), 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=friends[0].keys())
-            writer.writeheader()
-            writer.writerows(friends)
+        write_atomic(csv_path, write_csv, 'w', newline='', encoding='utf-8')
         log("Database updated.", Fore.GREEN)
     except IOError:
         log("Failed to save CSV.", Fore.RED, "ERROR")
@@ -294,14 +372,35 @@ if __name__ == "__main__":
         log("Process terminated.", Fore.RED, "EXIT")
         sys.exit(1)
 
-    uid, username = get_auth_user(cookie)
-    if not uid: sys.exit(1)
-
-    raw_friends = fetch_friend_ids(uid, cookie)
-    if raw_friends is None:
-        log("API Error. Halting.", Fore.RED, "STOP")
-        sys.exit(1)
-
-    data = fetch_user_details(raw_friends, cookie, username)
-    analyze_changes(data, username)
-    save_database(data, username)
\ No newline at end of file
+    with create_session(cookie) as session, ThreadPoolExecutor(max_workers=1) as pool:
+        # Speculatively fetch the last known user's friends while auth is in flight
+        cached_uid = load_cached_uid()
+        cancel = threading.Event()
+        speculative = None
+        if cached_uid:
+            speculative = pool.submit(fetch_friend_ids, session, cached_uid, cancel, False)
+
+        uid, username = get_auth_user(session)
+        if speculative and uid != cached_uid:
+            # Wrong guess or failed auth: stop paging after the in-flight request
+            cancel.set()
+            speculative = None
+        if not uid: sys.exit(1)
+
+        raw_friends = speculative.result() if speculative else None
+        if raw_friends is not None:
+            log(f"Found {len(raw_friends)} connections.", Fore.BLUE)
+        else:
+            # First run, different account, or the guess failed: fetch for real
+            if uid != cached_uid: save_cached_uid(uid)
+            raw_friends = fetch_friend_ids(session, uid)
+
+        if raw_friends is None:
+            log("API Error. Halting.", Fore.RED, "STOP")
+            sys.exit(1)
+
+        old_list = load_local_history(username)
+        data, data_map, invalid_count = fetch_user_details(session, raw_friends, old_list)
+
+    analyze_changes(data_map, old_list, invalid_count, username)
+    save_database(data, old_list, invalid_count, username)
\ No newline at end of file